@@ -1,14 +1,18 @@
+import glob
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import time
+import zlib
+from importlib.metadata import version
+import joblib
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestRegressor
 from plant_database import plant_requirements
-from utils import analyze_nutrient_suitability, generate_synthetic_targets
+from utils import analyze_plant_suitability, generate_synthetic_targets
 
 # Set page configuration
 st.set_page_config(
@@ -28,6 +32,33 @@ DEFAULT_VALUES = {
     'Degradation_Rate': 1.0
 }
 
+# Numeric feature columns
+NUMERIC_COLUMNS = ['Moisture_Content', 'pH_Level', 'Carbon_Content', 
+                   'Particle_Size_mm', 'Age_Days', 'Degradation_Rate']
+
+# Directory where trained models are persisted across sessions
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+# Bump whenever the preprocessing or model configuration changes so persisted
+# models trained with the old setup are not reused
+MODEL_VERSION = 1
+
+# Most persisted model files kept; the least recently used are removed first
+MODEL_CACHE_MAX_FILES = 20
+
+# Nutrient targets predicted by the models
+TARGET_VARIABLES = ['Nitrogen_pct', 'Phosphorus_pct', 'Potassium_pct']
+
+# Column types known ahead of parsing. The other feature columns may hold
+# either numbers or categorical levels, so their types are still inferred,
+# falling back to the C parser when pyarrow's inference rejects the file.
+CSV_DTYPES = {
+    'Waste_Type': 'category',
+    'Nitrogen_pct': 'float32',
+    'Phosphorus_pct': 'float32',
+    'Potassium_pct': 'float32'
+}
+
 # Mapping for categorical values to numeric
 CATEGORICAL_MAPPINGS = {
     'Moisture_Content': {'Low': 30.0, 'Medium': 50.0, 'High': 70.0},
@@ -38,40 +69,93 @@ CATEGORICAL_MAPPINGS = {
     'Degradation_Rate': {'Slow': 0.5, 'Medium': 1.0, 'Fast': 2.0}
 }
 
-def convert_categorical_to_numeric(data):
+def convert_categorical_to_numeric(data, report):
     """Convert categorical values to numeric using predefined mappings."""
     for col, mapping in CATEGORICAL_MAPPINGS.items():
         if col in data.columns and data[col].dtype == 'object':
-            if data[col].isin(mapping.keys()).any():
-                data[col] = data[col].map(mapping)
-                st.info(f"Converted categorical values in '{col}' to numeric using mapping: {mapping}")
+            values = np.array(list(mapping.values()), dtype=np.float64)
+            codes = pd.Categorical(data[col], categories=list(mapping.keys())).codes
+            mask = codes >= 0
+            if mask.any():
+                data.loc[mask, col] = values[codes[mask]]
+                report['converted'][col] = mapping
     return data
 
-def handle_missing_data(data):
-    """Handle missing columns and values with user guidance."""
-    missing_columns = []
-    missing_values = {}
-    
+def handle_missing_data(data, report):
+    """Handle missing columns and values, recording what was filled in the report."""
     # Check for missing columns
     for col, default_value in DEFAULT_VALUES.items():
         if col not in data.columns:
-            missing_columns.append(col)
+            report['missing_columns'].append(col)
             data[col] = default_value
     
     # Check for missing values in numeric columns
-    numeric_columns = ['Moisture_Content', 'pH_Level', 'Carbon_Content', 
-                      'Particle_Size_mm', 'Age_Days', 'Degradation_Rate']
-    for col in numeric_columns:
+    for col in NUMERIC_COLUMNS:
         if col in data.columns:
             try:
                 data[col] = pd.to_numeric(data[col], errors='coerce')
                 if data[col].isna().any():
-                    missing_values[col] = data[col].isna().sum()
+                    count = data[col].isna().sum()
                     data[col] = data[col].fillna(data[col].mean())
+                    report['missing_values'][col] = (count, data[col].mean())
             except Exception as e:
-                st.error(f"Error converting '{col}' to numeric: {str(e)}")
+                report['errors'][col] = str(e)
                 data[col] = DEFAULT_VALUES[col]
     
+    # float32 is precise enough for these measurements and halves the memory moved through training
+    data[NUMERIC_COLUMNS] = data[NUMERIC_COLUMNS].astype(np.float32)
+    
+    return data
+
+@st.cache_data(show_spinner=False)
+def load_csv(file_bytes: bytes) -> pd.DataFrame:
+    """Parse the uploaded CSV file."""
+    import pyarrow as pa
+    
+    try:
+        return pd.read_csv(io.BytesIO(file_bytes), dtype=CSV_DTYPES, engine='pyarrow')
+    except (pa.ArrowInvalid, pd.errors.ParserError):
+        # pyarrow fixes each inferred column type from the first block, so a
+        # feature column that later switches from numbers to levels (or from
+        # integers to decimals) fails to convert; the C engine handles these
+        return pd.read_csv(io.BytesIO(file_bytes), dtype=CSV_DTYPES, engine='c', low_memory=False)
+
+@st.cache_data(show_spinner=False)
+def load_and_clean(file_bytes: bytes):
+    """Parse and clean the uploaded CSV, returning the cleaned data and a report of the changes made."""
+    report = {'converted': {}, 'missing_columns': [], 'missing_values': {}, 'errors': {}}
+    data = load_csv(file_bytes)
+    data = convert_categorical_to_numeric(data, report)
+    data = handle_missing_data(data, report)
+    return data, report
+
+@st.cache_data(show_spinner=False)
+def load_overview(file_bytes: bytes):
+    """Raw-row preview, target presence and cleaning report, small enough to reload on every rerun."""
+    preview = load_csv(file_bytes).head()
+    data, report = load_and_clean(file_bytes)
+    has_targets = all(target in data.columns for target in TARGET_VARIABLES)
+    return preview, has_targets, report
+
+@st.cache_data(show_spinner=False)
+def summary_stats(file_bytes: bytes) -> dict:
+    """Column means and the most common waste type, used as prediction input defaults."""
+    data, _ = load_and_clean(file_bytes)
+    stats = {col: float(data[col].mean()) for col in NUMERIC_COLUMNS}
+    stats['Waste_Type_mode'] = data['Waste_Type'].mode()[0]
+    return stats
+
+def show_data_report(report):
+    """Show the user what was converted or filled in while cleaning the data."""
+    for col, mapping in report['converted'].items():
+        st.info(f"Converted categorical values in '{col}' to numeric using mapping: {mapping}")
+    
+    for col, error in report['errors'].items():
+        st.error(f"Error converting '{col}' to numeric: {error}")
+    
+    missing_columns = report['missing_columns']
+    missing_values = report['missing_values']
+    
     # Show guidance message
     if missing_columns or missing_values:
         st.warning("""
@@ -87,8 +171,8 @@ def handle_missing_data(data):
         
         if missing_values:
             st.write("**Missing Values:**")
-            for col, count in missing_values.items():
-                st.write(f"- {col}: {count} missing values filled with mean ({data[col].mean():.2f})")
+            for col, (count, mean) in missing_values.items():
+                st.write(f"- {col}: {count} missing values filled with mean ({mean:.2f})")
         
         st.write("""
         For more accurate results, please provide complete data with all columns:
@@ -100,8 +184,149 @@ def handle_missing_data(data):
         - Age_Days
         - Degradation_Rate
         """)
+
+def dataset_digest(data_bytes):
+    """Short content hash identifying an uploaded dataset."""
+    return hashlib.sha1(data_bytes).hexdigest()[:12]
+
+def model_cache_suffix():
+    """File name suffix shared by models persisted with the current model and scikit-learn versions."""
+    # Pickled estimators are only safe to load with the scikit-learn version that wrote them
+    return f"_v{MODEL_VERSION}_sklearn{version('scikit-learn')}.joblib"
+
+def model_cache_path(data_bytes, test_size):
+    """Path of the persisted models for a dataset, test size, model version and scikit-learn version."""
+    return os.path.join(
+        MODEL_CACHE_DIR,
+        f"models_{dataset_digest(data_bytes)}_{round(test_size * 100)}{model_cache_suffix()}"
+    )
+
+def load_saved_models(data_bytes, test_size):
+    """Load previously persisted models for this dataset, or return None if there are none."""
+    path = model_cache_path(data_bytes, test_size)
+    if not os.path.exists(path):
+        return None
+    try:
+        models = joblib.load(path)
+    except (OSError, EOFError, pickle.UnpicklingError, zlib.error):
+        # Unreadable or corrupt file: drop it so the models are retrained and saved again
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    # Mark the file as recently used so pruning keeps it
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return models
+
+def save_models(models, data_bytes, test_size):
+    """Persist models atomically, then prune the model cache."""
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    # Write to a temporary file and move it into place so concurrent sessions
+    # and interrupted writes never leave a truncated file at the final path
+    fd, tmp_path = tempfile.mkstemp(dir=MODEL_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            joblib.dump(models, f, compress=3)
+        os.replace(tmp_path, model_cache_path(data_bytes, test_size))
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    prune_model_cache()
+
+def prune_model_cache():
+    """Remove outdated, stale temporary and least recently used persisted model files."""
+    suffix = model_cache_suffix()
+    current = []
+    for path in glob.glob(os.path.join(MODEL_CACHE_DIR, 'models_*.joblib')):
+        if path.endswith(suffix):
+            current.append(path)
+        else:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
     
-    return data
+    # Temporary files left behind by processes killed mid-write
+    for path in glob.glob(os.path.join(MODEL_CACHE_DIR, '*.tmp')):
+        try:
+            if time.time() - os.path.getmtime(path) > 3600:
+                os.remove(path)
+        except OSError:
+            pass
+    
+    current.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0, reverse=True)
+    for path in current[MODEL_CACHE_MAX_FILES:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+@st.cache_resource(show_spinner=False)
+def train_models(data_bytes: bytes, test_size: float) -> tuple:
+    """Train the shared preprocessor and per-target models, cached on the uploaded file contents and test size."""
+    saved = load_saved_models(data_bytes, test_size)
+    if saved is not None:
+        return saved
+    
+    # Imported here so page loads that never train a model skip loading scikit-learn
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler, OneHotEncoder
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.multioutput import MultiOutputRegressor
+    
+    data, _ = load_and_clean(data_bytes)
+    
+    # Prepare features
+    X = data[list(DEFAULT_VALUES.keys())]
+    
+    # Create synthetic target variables if not present
+    if not all(target in data.columns for target in TARGET_VARIABLES):
+        data = generate_synthetic_targets(data)
+    
+    # Split data once for all targets
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, data[TARGET_VARIABLES], test_size=test_size, random_state=42
+    )
+    
+    # Fit the shared preprocessor once
+    numeric_features = X.select_dtypes(include=['number']).columns
+    categorical_features = X.select_dtypes(include=['object', 'category']).columns
+    
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), numeric_features),
+            ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False, dtype=np.float32), categorical_features)
+        ])
+    # Dense C-ordered float32 features and column-ordered targets let each
+    # forest, fitted in this process, use its inputs as-is instead of
+    # copying them per target
+    X_train_transformed = np.ascontiguousarray(preprocessor.fit_transform(X_train), dtype=np.float32)
+    y_train = np.asfortranarray(y_train.to_numpy(dtype=np.float64))
+    
+    # Train one forest per target on the shared features. The targets are fitted
+    # in this process one after another; each forest already builds its trees
+    # on all cores, so an outer worker pool would only add process start-up
+    # and pickling overhead.
+    regressor = MultiOutputRegressor(
+        RandomForestRegressor(n_estimators=30, max_depth=10, random_state=42, n_jobs=-1)
+    )
+    regressor.fit(X_train_transformed, y_train)
+    
+    # Persist the models so later sessions can skip training
+    try:
+        save_models((preprocessor, regressor), data_bytes, test_size)
+    except OSError:
+        pass
+    
+    return preprocessor, regressor
 
 # Main app title
 st.title("🌱 Waste Nutrient Analysis & Plant Recommendations")
@@ -129,70 +354,46 @@ Your CSV file can include any of these columns (all are optional, defaults will
 
 if uploaded_file is not None:
     try:
-        data = pd.read_csv(uploaded_file)
+        file_bytes = uploaded_file.getvalue()
+        preview, has_targets, report = load_overview(file_bytes)
         st.success("Dataset successfully loaded!")
         
         # Display dataset overview
         st.subheader("Dataset Overview")
-        st.write(data.head())
-        
-        # Convert categorical values to numeric
-        data = convert_categorical_to_numeric(data)
+        st.write(preview)
         
-        # Handle missing data with user guidance
-        data = handle_missing_data(data)
+        # Show how categorical values and missing data were handled
+        show_data_report(report)
         
         # Model training section
         st.subheader("Model Training")
         
         test_size = st.slider("Test Data Size (%)", 10, 50, 20) / 100
         
+        # Drop models trained on a different dataset and reuse any models
+        # persisted by an earlier session for this one
+        model_key = dataset_digest(file_bytes)
+        if st.session_state.get('model_key') != model_key:
+            st.session_state.pop('preprocessor', None)
+            st.session_state.pop('regressor', None)
+            st.session_state.model_key = model_key
+            saved = load_saved_models(file_bytes, test_size)
+            if saved is not None:
+                st.session_state.preprocessor, st.session_state.regressor = saved
+                st.info("Loaded previously trained models for this dataset.")
+        
         if st.button("Train Model"):
-            # Prepare features
-            X = data[list(DEFAULT_VALUES.keys())]
-            
-            # Define target variables
-            target_variables = ['Nitrogen_pct', 'Phosphorus_pct', 'Potassium_pct']
-            
             # Create synthetic target variables if not present
-            if not all(target in data.columns for target in target_variables):
+            if not has_targets:
                 st.warning("Target variables not found in dataset. Creating synthetic targets for demonstration.")
-                data = generate_synthetic_targets(data)
-            
-            # Train models
-            models = {}
-            for target in target_variables:
-                y = data[target]
-                
-                # Split data
-                X_train, X_test, y_train, y_test = train_test_split(
-                    X, y, test_size=test_size, random_state=42
-                )
-                
-                # Create and train model
-                numeric_features = X.select_dtypes(include=['int64', 'float64']).columns
-                categorical_features = X.select_dtypes(include=['object']).columns
-                
-                preprocessor = ColumnTransformer(
-                    transformers=[
-                        ('num', StandardScaler(), numeric_features),
-                        ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
-                    ])
-                
-                model = Pipeline([
-                    ('preprocessor', preprocessor),
-                    ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
-                ])
-                
-                model.fit(X_train, y_train)
-                models[target] = model
             
-            st.session_state.models = models
+            st.session_state.preprocessor, st.session_state.regressor = train_models(file_bytes, test_size)
             st.success("Models trained successfully!")
         
         # Prediction section
-        if 'models' in st.session_state:
+        if 'regressor' in st.session_state:
             st.subheader("Nutrient Prediction")
+            stats = summary_stats(file_bytes)
             
             # Input form for prediction
             col1, col2 = st.columns(2)
@@ -200,15 +401,15 @@ if uploaded_file is not None:
             with col1:
                 waste_type = st.selectbox("Waste Type", 
                                         options=['Food', 'Garden', 'Paper', 'Mixed', 'Agricultural'],
-                                        index=['Food', 'Garden', 'Paper', 'Mixed', 'Agricultural'].index(data['Waste_Type'].mode()[0]))
-                moisture_content = st.slider("Moisture Content (%)", 10.0, 90.0, float(data['Moisture_Content'].mean()))
-                ph_level = st.slider("pH Level", 3.5, 9.0, float(data['pH_Level'].mean()))
-                carbon_content = st.slider("Carbon Content (%)", 10.0, 60.0, float(data['Carbon_Content'].mean()))
+                                        index=['Food', 'Garden', 'Paper', 'Mixed', 'Agricultural'].index(stats['Waste_Type_mode']))
+                moisture_content = st.slider("Moisture Content (%)", 10.0, 90.0, stats['Moisture_Content'])
+                ph_level = st.slider("pH Level", 3.5, 9.0, stats['pH_Level'])
+                carbon_content = st.slider("Carbon Content (%)", 10.0, 60.0, stats['Carbon_Content'])
             
             with col2:
-                particle_size = st.slider("Particle Size (mm)", 0.5, 50.0, float(data['Particle_Size_mm'].mean()))
-                age_days = st.slider("Age (Days)", 1, 365, int(data['Age_Days'].mean()))
-                degradation_rate = st.slider("Degradation Rate", 0.1, 5.0, float(data['Degradation_Rate'].mean()))
+                particle_size = st.slider("Particle Size (mm)", 0.5, 50.0, stats['Particle_Size_mm'])
+                age_days = st.slider("Age (Days)", 1, 365, int(stats['Age_Days']))
+                degradation_rate = st.slider("Degradation Rate", 0.1, 5.0, stats['Degradation_Rate'])
             
             # Create input data for prediction
             input_data = pd.DataFrame({
@@ -219,45 +420,36 @@ if uploaded_file is not None:
                 'Particle_Size_mm': [particle_size],
                 'Age_Days': [age_days],
                 'Degradation_Rate': [degradation_rate]
-            })
+            }).astype({col: np.float32 for col in NUMERIC_COLUMNS})
             
             if st.button("Predict and Analyze"):
                 # Make predictions
-                predictions = {}
-                for target, model in st.session_state.models.items():
-                    predictions[target] = model.predict(input_data)[0]
+                input_transformed = st.session_state.preprocessor.transform(input_data)
+                # Predict through the fitted estimators directly so a one-row input
+                # never goes through MultiOutputRegressor's joblib dispatch
+                predictions = {
+                    target: estimator.predict(input_transformed)[0]
+                    for target, estimator in zip(TARGET_VARIABLES, st.session_state.regressor.estimators_)
+                }
                 
                 # Display predictions
                 st.subheader("Predicted Nutrient Content")
                 
                 # Create visualization
-                fig, ax = plt.subplots(figsize=(10, 6))
-                nutrients = list(predictions.keys())
-                values = list(predictions.values())
-                
-                bars = ax.bar(nutrients, values, color=['#2ecc71', '#3498db', '#e74c3c'])
-                
-                # Add value labels
-                for bar in bars:
-                    height = bar.get_height()
-                    ax.annotate(f'{height:.2f}%',
-                              xy=(bar.get_x() + bar.get_width() / 2, height),
-                              xytext=(0, 3),
-                              textcoords="offset points",
-                              ha='center', va='bottom')
-                
-                plt.title('Predicted Nutrient Percentages')
-                plt.ylabel('Percentage (%)')
-                plt.tight_layout()
-                st.pyplot(fig)
+                chart_df = pd.DataFrame({
+                    'Nutrient': list(predictions.keys()),
+                    'Percentage (%)': list(predictions.values())
+                }).set_index('Nutrient')
+                st.bar_chart(chart_df)
                 
                 # Plant recommendations
                 st.subheader("Plant Recommendations")
                 
                 # Analyze suitability for each plant type
+                plant_suitability = analyze_plant_suitability(predictions)
                 for plant_type, plant_info in plant_requirements.items():
                     st.write(f"### {plant_type}")
-                    suitability, recommendations = analyze_nutrient_suitability(predictions, plant_info)
+                    suitability, recommendations = plant_suitability[plant_type]
                     
                     # Create three columns for each nutrient
                     cols = st.columns(3)
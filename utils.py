@@ -1,57 +1,72 @@
 import numpy as np
 import pandas as pd
+from plant_database import plant_requirements
 
-def analyze_nutrient_suitability(predictions, plant_info):
-    """Analyze how suitable the predicted nutrients are for a specific plant type."""
-    suitability = {}
-    recommendations = []
-    
-    for nutrient in ['Nitrogen', 'Phosphorus', 'Potassium']:
-        if f'{nutrient}_pct' in predictions:
-            value = predictions[f'{nutrient}_pct']
-            req = plant_info[nutrient]
-            
-            if value < req['min']:
-                status = 'Low'
-                action = f'Increase {nutrient}'
-            elif value > req['max']:
-                status = 'High'
-                action = f'Reduce {nutrient}'
-            else:
-                status = 'Optimal'
-                action = 'Maintain levels'
-                
+NUTRIENTS = ['Nitrogen', 'Phosphorus', 'Potassium']
+
+# Plant requirement ranges as (plant, nutrient) matrices for vectorized comparison
+PLANT_TYPES = list(plant_requirements.keys())
+PLANT_MIN = np.array([[req[nutrient]['min'] for nutrient in NUTRIENTS] for req in plant_requirements.values()])
+PLANT_MAX = np.array([[req[nutrient]['max'] for nutrient in NUTRIENTS] for req in plant_requirements.values()])
+PLANT_OPTIMAL = np.array([[req[nutrient]['optimal'] for nutrient in NUTRIENTS] for req in plant_requirements.values()])
+
+LOW_ACTIONS = [f'Increase {nutrient}' for nutrient in NUTRIENTS]
+HIGH_ACTIONS = [f'Reduce {nutrient}' for nutrient in NUTRIENTS]
+LOW_RECOMMENDATIONS = [f"- {nutrient} is low. Consider supplementing with {nutrient}-rich materials." for nutrient in NUTRIENTS]
+HIGH_RECOMMENDATIONS = [f"- {nutrient} is high. Consider mixing with lower {nutrient} materials." for nutrient in NUTRIENTS]
+
+def analyze_plant_suitability(predictions):
+    """Analyze how suitable the predicted nutrients are for every plant type at once."""
+    values = np.array([predictions[f'{nutrient}_pct'] for nutrient in NUTRIENTS])
+    low = values < PLANT_MIN
+    high = values > PLANT_MAX
+    status = np.where(low, 'Low', np.where(high, 'High', 'Optimal'))
+    
+    results = {}
+    for i, plant_type in enumerate(PLANT_TYPES):
+        suitability = {}
+        recommendations = []
+        for j, nutrient in enumerate(NUTRIENTS):
             suitability[nutrient] = {
-                'status': status,
-                'current': value,
-                'optimal': req['optimal'],
-                'action': action
+                'status': str(status[i, j]),
+                'current': values[j],
+                'optimal': PLANT_OPTIMAL[i, j],
+                'action': LOW_ACTIONS[j] if low[i, j] else HIGH_ACTIONS[j] if high[i, j] else 'Maintain levels'
             }
-            
-            if status != 'Optimal':
-                if status == 'Low':
-                    recommendations.append(f"- {nutrient} is low. Consider supplementing with {nutrient}-rich materials.")
-                else:
-                    recommendations.append(f"- {nutrient} is high. Consider mixing with lower {nutrient} materials.")
-    
-    return suitability, recommendations
+            if low[i, j]:
+                recommendations.append(LOW_RECOMMENDATIONS[j])
+            elif high[i, j]:
+                recommendations.append(HIGH_RECOMMENDATIONS[j])
+        results[plant_type] = (suitability, recommendations)
+    
+    return results
 
-def generate_synthetic_targets(data):
+def generate_synthetic_targets(data, seed=42):
     """Generate synthetic target variables based on waste characteristics."""
-    data['Nitrogen_pct'] = (
-        (data['Waste_Type'] == 'Food') * np.random.uniform(1.5, 4.0, len(data)) +
-        (data['Waste_Type'] == 'Garden') * np.random.uniform(0.5, 2.0, len(data)) +
-        data['Moisture_Content'] * 0.01 - data['pH_Level'] * 0.1
-    ).clip(0.05, 5.0)
-    
-    data['Phosphorus_pct'] = (
-        (data['Waste_Type'] == 'Food') * np.random.uniform(0.3, 1.2, len(data)) +
-        data['Carbon_Content'] * 0.005
-    ).clip(0.01, 2.0)
-    
-    data['Potassium_pct'] = (
-        (data['Waste_Type'] == 'Food') * np.random.uniform(1.0, 2.5, len(data)) +
-        data['Moisture_Content'] * 0.008
-    ).clip(0.05, 3.0)
+    rng = np.random.default_rng(seed)
+    n_rows = len(data)
+    
+    food_mask = (data['Waste_Type'] == 'Food').to_numpy()
+    garden_mask = (data['Waste_Type'] == 'Garden').to_numpy()
+    n_food = food_mask.sum()
+    
+    moisture = data['Moisture_Content'].to_numpy() * 0.01
+    
+    nitrogen = np.zeros(n_rows)
+    nitrogen[food_mask] = rng.uniform(1.5, 4.0, n_food)
+    nitrogen[garden_mask] = rng.uniform(0.5, 2.0, garden_mask.sum())
+    data['Nitrogen_pct'] = np.clip(
+        nitrogen + moisture - data['pH_Level'].to_numpy() * 0.1, 0.05, 5.0
+    )
+    
+    phosphorus = np.zeros(n_rows)
+    phosphorus[food_mask] = rng.uniform(0.3, 1.2, n_food)
+    data['Phosphorus_pct'] = np.clip(
+        phosphorus + data['Carbon_Content'].to_numpy() * 0.005, 0.01, 2.0
+    )
+    
+    potassium = np.zeros(n_rows)
+    potassium[food_mask] = rng.uniform(1.0, 2.5, n_food)
+    data['Potassium_pct'] = np.clip(potassium + moisture * 0.8, 0.05, 3.0)
     
     return data 
\ No newline at end of file